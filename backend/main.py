@@ -4,18 +4,25 @@ Handles video upload, processing coordination, and results delivery
 """
 
 import os
+import time
 import uuid
 import shutil
-import json
 import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Dict, Optional
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+import aiofiles
+import orjson
+from blake3 import blake3
+from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel
 import asyncio
 from concurrent.futures import ProcessPoolExecutor
-from video_processor import VideoProcessor
+from video_processor import DEFAULT_BATCH_SIZE, FILTERS, VideoProcessor, get_hw_encoder, warm_up_filters
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,52 +40,272 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Storage directories
-UPLOAD_DIR = "uploads"
-OUTPUT_DIR = "outputs"
-JOBS_FILE = "jobs.json"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-# Job storage with persistence
-jobs: Dict[str, dict] = {}
-
-def load_jobs():
-    """Load jobs from disk"""
-    global jobs
+# Storage directories. Point these at a tmpfs mount (e.g. /dev/shm/renderx/...)
+# to keep uploads, intermediate segments and outputs in RAM; STORAGE_LIMIT_MB
+# then bounds how much space uploads and outputs may take.
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "outputs")
+WORK_DIR = os.getenv("WORK_DIR", "segments")
+STORAGE_LIMIT_MB = int(os.getenv("STORAGE_LIMIT_MB", 0))  # 0 = unlimited
+STORAGE_SWEEP_SECONDS = 60
+# Files that may still be being written
+IN_PROGRESS_SUFFIXES = (".part", ".tmp", ".part.mp4", ".temp.mp4")
+# How long in-progress files and not yet processed uploads survive a sweep;
+# after that they are treated as abandoned and evicted like any other file
+STORAGE_GRACE_SECONDS = int(os.getenv("STORAGE_GRACE_SECONDS", 3600))
+JOBS_DB = "jobs.db"
+LEGACY_JOBS_FILE = "jobs.json"
+
+@dataclass(slots=True)
+class Job:
+    """In-memory record of an uploaded video and its processing results"""
+    job_id: str
+    status: str  # 'uploaded', 'processing', 'completed', 'failed'
+    filename: str
+    file_path: str
+    filter_type: Optional[str] = None
+    analytics: Optional[dict] = None
+    sequential_time: Optional[float] = None
+    parallel_time: Optional[float] = None
+    speedup: Optional[float] = None
+    segments_processed: Optional[int] = None
+    cpu_cores_used: Optional[int] = None
+    output_filename: Optional[str] = None
+    output_path: Optional[str] = None
+    error: Optional[str] = None
+    content_hash: Optional[str] = None  # BLAKE3 digest of the uploaded file
+
+
+# Job storage with persistence (SQLite in WAL mode, one row per job).
+# Jobs are loaded on demand into a bounded LRU cache; writes go through a
+# separate connection so status reads never wait on a flush in progress.
+JOB_CACHE_SIZE = 1024
+_job_cache: "OrderedDict[str, Job]" = OrderedDict()
+
+db: Optional[sqlite3.Connection] = None
+read_db: Optional[sqlite3.Connection] = None
+db_lock = threading.Lock()
+
+def open_jobs_db():
+    """Open the jobs database, creating the table if needed"""
+    global db, read_db
+    db = sqlite3.connect(JOBS_DB, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, data BLOB NOT NULL)")
+    # Indexed copies of the fields used to find duplicate uploads
+    columns = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+    for column in ("content_hash", "filter_type"):
+        if column not in columns:
+            db.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+    db.execute("CREATE INDEX IF NOT EXISTS jobs_by_content ON jobs (content_hash, filter_type)")
+    read_db = sqlite3.connect(JOBS_DB, check_same_thread=False)
+
+def migrate_legacy_jobs():
+    """Import jobs from the old jobs.json file (runs once per database)"""
+    if db.execute("PRAGMA user_version").fetchone()[0] >= 1:
+        return
     try:
-        if os.path.exists(JOBS_FILE):
-            with open(JOBS_FILE, 'r') as f:
-                jobs = json.load(f)
-                logger.info(f"Loaded {len(jobs)} jobs from disk")
+        if os.path.exists(LEGACY_JOBS_FILE):
+            with open(LEGACY_JOBS_FILE, 'rb') as f:
+                legacy_jobs = orjson.loads(f.read())
+            with db:
+                db.executemany(
+                    "INSERT OR IGNORE INTO jobs (job_id, data) VALUES (?, ?)",
+                    [(job_id, orjson.dumps(job)) for job_id, job in legacy_jobs.items()]
+                )
+            logger.info(f"Migrated {len(legacy_jobs)} jobs from {LEGACY_JOBS_FILE}")
     except Exception as e:
-        logger.error(f"Error loading jobs: {e}")
-        jobs = {}
+        logger.error(f"Error migrating legacy jobs: {e}")
+    db.execute("PRAGMA user_version = 1")
 
-def save_jobs():
-    """Save jobs to disk"""
+def fail_interrupted_jobs():
+    """Mark jobs left queued or processing by a previous run as failed"""
     try:
-        with open(JOBS_FILE, 'w') as f:
-            json.dump(jobs, f, indent=2)
-        logger.info(f"Saved {len(jobs)} jobs to disk")
+        rows = db.execute(
+            "SELECT data FROM jobs "
+            "WHERE json_extract(CAST(data AS TEXT), '$.status') IN ('queued', 'processing')"
+        ).fetchall()
+    except Exception as e:
+        logger.error(f"Error looking up interrupted jobs: {e}")
+        return
+    # The job queue only lives in memory, so these will never be rendered
+    for (data,) in rows:
+        job = Job(**orjson.loads(data))
+        job.status = 'failed'
+        job.error = 'Processing was interrupted by a server restart'
+        save_job(job)
+    save_pending_jobs()
+    if rows:
+        logger.info(f"Marked {len(rows)} interrupted jobs as failed")
+
+def cache_job(job: Job):
+    """Add a job to the cache, evicting the least recently used ones"""
+    _job_cache[job.job_id] = job
+    _job_cache.move_to_end(job.job_id)
+    while len(_job_cache) > JOB_CACHE_SIZE:
+        # Evicted jobs with unsaved changes stay reachable via _dirty_jobs
+        _job_cache.popitem(last=False)
+
+def get_job(job_id: str) -> Optional[Job]:
+    """Return a job from the cache, loading it from disk on a miss"""
+    if job_id in _deleted_job_ids:
+        return None
+    job = _job_cache.get(job_id) or _dirty_jobs.get(job_id)
+    if job is None and job_id in _inflight_jobs:
+        # Its write hasn't landed yet, so the row on disk is stale
+        job = _inflight_jobs[job_id]
+        if job is None:
+            return None
+    elif job is None:
+        try:
+            row = read_db.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        except Exception as e:
+            logger.error("Error loading job %s: %s", job_id, e)
+            return None
+        if row is None:
+            return None
+        job = Job(**orjson.loads(row[0]))
+    cache_job(job)
+    return job
+
+def find_rendered_duplicate(job: Job, filter_type: str) -> Optional[Job]:
+    """Return a completed job for the same video content and filter, if any"""
+    if not job.content_hash:
+        return None
+    try:
+        rows = read_db.execute(
+            "SELECT job_id FROM jobs WHERE content_hash = ? AND filter_type = ? AND job_id != ?",
+            (job.content_hash, filter_type, job.job_id)
+        ).fetchall()
+    except Exception as e:
+        logger.error(f"Error looking up duplicates of job {job.job_id}: {e}")
+        return None
+    for (job_id,) in rows:
+        other = get_job(job_id)
+        if (other is not None and other.status == 'completed'
+                and other.output_path and os.path.exists(other.output_path)):
+            return other
+    return None
+
+def write_jobs(rows, deleted_job_ids=()):
+    """Write serialized job rows to disk and drop deleted jobs"""
+    if not rows and not deleted_job_ids:
+        return
+    try:
+        with db_lock, db:
+            db.executemany(
+                "INSERT OR REPLACE INTO jobs (job_id, data, content_hash, filter_type) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            db.executemany(
+                "DELETE FROM jobs WHERE job_id = ?",
+                [(job_id,) for job_id in deleted_job_ids]
+            )
+        logger.debug("Saved %d jobs to disk", len(rows))
     except Exception as e:
         logger.error(f"Error saving jobs: {e}")
 
-# Load existing jobs on startup
-load_jobs()
-
-# Process executor for background processing
-executor = ProcessPoolExecutor(max_workers=1)
+# Pending writes are coalesced and flushed by a background task,
+# which only rewrites the rows of jobs that changed since the last flush
+SAVE_DELAY_SECONDS = 0.5
+_jobs_dirty = asyncio.Event()
+_dirty_jobs: Dict[str, Job] = {}
+_deleted_job_ids = set()
+# Jobs whose snapshot is being written, None for deletions
+_inflight_jobs: Dict[str, Optional[Job]] = {}
+
+def save_job(job: Job):
+    """Schedule a save of a single job to disk"""
+    cache_job(job)
+    _deleted_job_ids.discard(job.job_id)
+    _dirty_jobs[job.job_id] = job
+    _jobs_dirty.set()
+
+def delete_job(job_id: str):
+    """Remove a job from the cache and schedule its removal from disk"""
+    _job_cache.pop(job_id, None)
+    _dirty_jobs.pop(job_id, None)
+    _deleted_job_ids.add(job_id)
+    _jobs_dirty.set()
+
+def collect_pending_writes():
+    """Snapshot serialized changed jobs and pending deletions for a write"""
+    rows = [
+        (job_id, orjson.dumps(job), job.content_hash, job.filter_type)
+        for job_id, job in _dirty_jobs.items()
+    ]
+    deleted_job_ids = list(_deleted_job_ids)
+    # Keep the snapshot readable until the write lands
+    _inflight_jobs.update(_dirty_jobs)
+    _inflight_jobs.update(dict.fromkeys(deleted_job_ids))
+    _dirty_jobs.clear()
+    _deleted_job_ids.clear()
+    return rows, deleted_job_ids
+
+def finish_pending_writes(rows, deleted_job_ids):
+    """Forget the in-flight snapshot once write_jobs() has returned"""
+    for job_id in [row[0] for row in rows] + deleted_job_ids:
+        _inflight_jobs.pop(job_id, None)
+
+def save_pending_jobs():
+    """Save pending job changes to disk immediately"""
+    rows, deleted_job_ids = collect_pending_writes()
+    write_jobs(rows, deleted_job_ids)
+    finish_pending_writes(rows, deleted_job_ids)
+
+flush_task: Optional[asyncio.Task] = None
+
+async def flush_jobs():
+    """Flush pending job changes at most once every SAVE_DELAY_SECONDS"""
+    while True:
+        await _jobs_dirty.wait()
+        await asyncio.sleep(SAVE_DELAY_SECONDS)
+        _jobs_dirty.clear()
+        # Serialize on the event loop so the snapshot is consistent,
+        # then do the blocking write in a thread
+        rows, deleted_job_ids = collect_pending_writes()
+        try:
+            await asyncio.to_thread(write_jobs, rows, deleted_job_ids)
+        finally:
+            finish_pending_writes(rows, deleted_job_ids)
+
+# Process executor for background processing, created on startup.
+# Concurrent renders split the CPU cores between them, so each render's
+# segment threads and OpenCV threads only use its share of the machine.
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
+RENDER_CORES = max(1, (os.cpu_count() or 1) // RENDER_WORKERS)
+executor: Optional[ProcessPoolExecutor] = None
+
+# Set to "cuda" to run filters on the GPU when OpenCV is built with CUDA
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "cpu")
+
+# Jobs waiting for a free render worker; new jobs are refused with HTTP 429
+# once the queue is full instead of piling up in memory
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", 32))
+job_queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_QUEUED_JOBS)
+background_tasks = []
 
 # Configuration
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
 ALLOWED_EXTENSIONS = {'.mp4'}
+# Frames per batch a client may ask for; the renderer further caps each
+# batch by bytes, so large frames get fewer
+MAX_BATCH_SIZE = 64
+
+# When running behind nginx, set this to an internal location aliased to
+# OUTPUT_DIR (e.g. "/internal_outputs/") so downloads are handed off via
+# X-Accel-Redirect and served by nginx with sendfile
+ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX")
 
 
 class ProcessRequest(BaseModel):
     """Request model for video processing"""
     job_id: str
     filter_type: str  # 'grayscale' or 'blur'
+    batch_size: int = DEFAULT_BATCH_SIZE  # Frames filtered together per batch
 
 
 class JobStatus(BaseModel):
@@ -124,7 +351,69 @@ def validate_video_file(filename: str, file_size: int) -> bool:
     return True
 
 
-def process_video_task(job_id: str, video_path: str, filter_type: str):
+def validate_video_header(header: bytes) -> bool:
+    """
+    Check that the uploaded data is actually an MP4 file
+    
+    Args:
+        header: First bytes of the uploaded file
+        
+    Returns:
+        True if valid, raises HTTPException otherwise
+    """
+    # Every MP4 file starts with an 'ftyp' box: 4-byte size, then the type
+    if len(header) < 8 or header[4:8] != b'ftyp':
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid file. The uploaded data is not an MP4 video"
+        )
+    
+    return True
+
+
+def prefetch_file(path: str, size: int):
+    """Hint the OS to keep a file's pages cached (no-op where unsupported)"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+
+def link_or_copy(src: str, dst: str):
+    """Hard-link a file, falling back to a copy across filesystems"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Copy under a temporary name so dst is never left half-written
+        tmp = dst + ".tmp"
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def get_video_analytics(video_path: str) -> dict:
+    """Probe a video file for its analytics"""
+    return VideoProcessor(video_path).get_video_analytics()
+
+
+def warm_up_worker():
+    """Initializer for render worker processes"""
+    warm_up_filters()
+    get_hw_encoder()
+
+
+def worker_ready():
+    """No-op task used to start the pool's worker processes ahead of time"""
+    return os.getpid()
+
+
+def process_video_task(job_id: str, video_path: str, filter_type: str, batch_size: int):
     """
     Background task for video processing
     This runs in a separate process
@@ -133,14 +422,22 @@ def process_video_task(job_id: str, video_path: str, filter_type: str):
         job_id: Unique job identifier
         video_path: Path to uploaded video
         filter_type: Filter to apply
+        batch_size: Number of frames filtered per batch
     """
     try:
-        # Create processor instance
-        processor = VideoProcessor(video_path)
+        # Create processor instance with its own scratch directory, so
+        # concurrent jobs never share segment files
+        processor = VideoProcessor(
+            video_path,
+            work_dir=os.path.join(WORK_DIR, job_id),
+            output_dir=OUTPUT_DIR,
+            backend=RENDER_BACKEND,
+            cores=RENDER_CORES
+        )
         
         # Process the video
         output_filename = f"{job_id}_processed.mp4"
-        result = processor.process_video(filter_type, output_filename)
+        result = processor.process_video(filter_type, output_filename, batch_size=batch_size)
         
         return {
             'job_id': job_id,
@@ -178,42 +475,60 @@ async def upload_video(file: UploadFile = File(...)):
     Returns:
         Job ID for tracking the upload
     """
-    # Read file to check size
-    contents = await file.read()
-    file_size = len(contents)
-    
-    # Validate file
-    validate_video_file(file.filename, file_size)
+    # Validate file type before reading any data
+    validate_video_file(file.filename, 0)
     
     # Generate unique job ID
     job_id = str(uuid.uuid4())
     
-    # Save uploaded file
+    # Stream uploaded file to disk in chunks, enforcing the size limit as we go
+    # (written to a temporary name and renamed once complete, so a crash
+    # mid-upload never leaves a truncated file under the final name)
     file_path = os.path.join(UPLOAD_DIR, f"{job_id}_{file.filename}")
-    with open(file_path, "wb") as f:
-        f.write(contents)
-    
-    # Get video analytics
+    part_path = file_path + ".part"
+    file_size = 0
+    hasher = blake3()
+    try:
+        async with aiofiles.open(part_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                if file_size == 0:
+                    validate_video_header(chunk)
+                file_size += len(chunk)
+                validate_video_file(file.filename, file_size)
+                hasher.update(chunk)
+                await out.write(chunk)
+        if file_size == 0:
+            validate_video_header(b"")
+        os.replace(part_path, file_path)
+    except Exception:
+        # Remove the partially written file on abort
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    
+    # Keep the freshly written file in the page cache for the reads that follow
+    prefetch_file(file_path, file_size)
+    
+    # Get video analytics (probing the file blocks, so run it in a thread)
     try:
-        processor = VideoProcessor(file_path)
-        analytics = processor.get_video_analytics()
+        analytics = await asyncio.to_thread(get_video_analytics, file_path)
         logger.info(f"Extracted analytics for {job_id}")
     except Exception as e:
         logger.error(f"Error extracting analytics: {e}")
         analytics = None
     
     # Create job record
-    jobs[job_id] = {
-        'job_id': job_id,
-        'status': 'uploaded',
-        'filename': file.filename,
-        'file_path': file_path,
-        'filter_type': None,
-        'analytics': analytics
-    }
+    job = Job(
+        job_id=job_id,
+        status='uploaded',
+        filename=file.filename,
+        file_path=file_path,
+        analytics=analytics,
+        content_hash=hasher.hexdigest()
+    )
     
     # Save to disk
-    save_jobs()
+    save_job(job)
     
     logger.info(f"Job {job_id} created and saved")
     
@@ -239,31 +554,78 @@ async def start_processing(request: ProcessRequest):
     """
     job_id = request.job_id
     filter_type = request.filter_type
+    batch_size = request.batch_size
     
     # Validate job exists
-    if job_id not in jobs:
+    job = get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs[job_id]
+    # Concurrent renders of one job would share its scratch and output files
+    if job.status in ('queued', 'processing'):
+        raise HTTPException(status_code=409, detail="Job is already being processed")
     
     # Validate filter type
-    valid_filters = ['grayscale', 'blur', 'sepia', 'brightness', 'contrast', 
-                     'saturation', 'warm_tone', 'cool_tone', 'edge_detection']
-    if filter_type not in valid_filters:
+    if filter_type not in FILTERS:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid filter type. Use one of: {', '.join(valid_filters)}"
+            detail=f"Invalid filter type. Use one of: {', '.join(FILTERS)}"
         )
     
-    # Update job status
-    job['status'] = 'processing'
-    job['filter_type'] = filter_type
-    save_jobs()
+    # Validate batch size
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid batch size. Use a value between 1 and {MAX_BATCH_SIZE}"
+        )
+    
+    # Identical uploads already rendered with this filter reuse that output
+    duplicate = find_rendered_duplicate(job, filter_type)
+    if duplicate is not None:
+        output_path = os.path.join(OUTPUT_DIR, f"{job_id}_processed.mp4")
+        await asyncio.to_thread(link_or_copy, duplicate.output_path, output_path)
+        
+        job = get_job(job_id)
+        if job is None:
+            # Cleaned up during the copy; don't bring it back
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        job.status = 'completed'
+        job.filter_type = filter_type
+        job.sequential_time = duplicate.sequential_time
+        job.parallel_time = duplicate.parallel_time
+        job.speedup = duplicate.speedup
+        job.segments_processed = duplicate.segments_processed
+        job.cpu_cores_used = duplicate.cpu_cores_used
+        job.output_filename = os.path.basename(output_path)
+        job.output_path = output_path
+        save_job(job)
+        
+        logger.info(f"Job {job_id} reused the output of job {duplicate.job_id}")
+        
+        return {
+            "message": "Video already processed",
+            "job_id": job_id,
+            "filter_type": filter_type
+        }
+    
+    # Queue the job for background processing
+    try:
+        job_queue.put_nowait((job_id, job.file_path, filter_type, batch_size))
+    except asyncio.QueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many videos are waiting to be processed. Please try again later"
+        )
     
-    logger.info(f"Started processing job {job_id} with filter: {filter_type}")
+    # Update job status
+    job.status = 'queued'
+    job.filter_type = filter_type
+    save_job(job)
     
-    # Start background processing
-    asyncio.create_task(process_in_background(job_id, job['file_path'], filter_type))
+    logger.info(f"Queued job {job_id} with filter: {filter_type}")
     
     return {
         "message": "Processing started",
@@ -272,7 +634,7 @@ async def start_processing(request: ProcessRequest):
     }
 
 
-async def process_in_background(job_id: str, video_path: str, filter_type: str):
+async def process_in_background(job_id: str, video_path: str, filter_type: str, batch_size: int):
     """
     Async wrapper for background processing
     
@@ -280,11 +642,18 @@ async def process_in_background(job_id: str, video_path: str, filter_type: str):
         job_id: Job identifier
         video_path: Path to video file
         filter_type: Filter to apply
+        batch_size: Number of frames filtered per batch
     """
     loop = asyncio.get_event_loop()
     
     try:
         logger.info(f"Background processing started for job {job_id}")
+        job = get_job(job_id)
+        if job is None:
+            logger.warning(f"Job {job_id} was cleaned up before processing")
+            return
+        job.status = 'processing'
+        save_job(job)
         
         # Run processing in separate process
         result_data = await loop.run_in_executor(
@@ -292,36 +661,100 @@ async def process_in_background(job_id: str, video_path: str, filter_type: str):
             process_video_task,
             job_id,
             video_path,
-            filter_type
+            filter_type,
+            batch_size
         )
         
         result = result_data['result']
-        job = jobs[job_id]
+        job = get_job(job_id)
+        if job is None:
+            logger.warning(f"Job {job_id} was cleaned up during processing")
+            return
         
         if result['success']:
             # Update job with results
-            job['status'] = 'completed'
-            job['sequential_time'] = result['sequential_time']
-            job['parallel_time'] = result['parallel_time']
-            job['speedup'] = result['speedup']
-            job['segments_processed'] = result['segments_processed']
-            job['cpu_cores_used'] = result['cpu_cores_used']
-            job['output_filename'] = os.path.basename(result['output_path'])
-            job['output_path'] = result['output_path']
+            job.status = 'completed'
+            job.sequential_time = result['sequential_time']
+            job.parallel_time = result['parallel_time']
+            job.speedup = result['speedup']
+            job.segments_processed = result['segments_processed']
+            job.cpu_cores_used = result['cpu_cores_used']
+            job.output_filename = os.path.basename(result['output_path'])
+            job.output_path = result['output_path']
             logger.info(f"Job {job_id} completed successfully")
         else:
-            job['status'] = 'failed'
-            job['error'] = result.get('error', 'Unknown error')
-            logger.error(f"Job {job_id} failed: {job.get('error')}")
+            job.status = 'failed'
+            job.error = result.get('error', 'Unknown error')
+            logger.error(f"Job {job_id} failed: {job.error}")
         
         # Save to disk
-        save_jobs()
+        save_job(job)
             
     except Exception as e:
         logger.error(f"Background processing error for job {job_id}: {e}")
-        jobs[job_id]['status'] = 'failed'
-        jobs[job_id]['error'] = str(e)
-        save_jobs()
+        job = get_job(job_id)
+        if job is not None:
+            job.status = 'failed'
+            job.error = str(e)
+            save_job(job)
+
+
+def sweep_storage():
+    """
+    Delete the least recently used upload and output files until their
+    combined size fits within STORAGE_LIMIT_MB
+    
+    Files of jobs that are queued or processing are never removed. Files
+    still being written (partial uploads, copies and merges) and uploads
+    waiting to be processed are kept until they are STORAGE_GRACE_SECONDS old
+    """
+    files = []
+    for directory in (UPLOAD_DIR, OUTPUT_DIR):
+        for entry in os.scandir(directory):
+            if entry.is_file():
+                stat = entry.stat()
+                files.append((max(stat.st_atime, stat.st_mtime), stat.st_mtime, stat.st_size, entry.path))
+    
+    total = sum(size for _, _, size, _ in files)
+    limit = STORAGE_LIMIT_MB * 1024 * 1024
+    now = time.time()
+    for _, mtime, size, path in sorted(files):
+        if total <= limit:
+            break
+        recent = now - mtime < STORAGE_GRACE_SECONDS
+        if recent and path.endswith(IN_PROGRESS_SUFFIXES):
+            continue
+        # Files are named "<job_id>_..."
+        job = get_job(os.path.basename(path)[:36])
+        if job is not None and (job.status in ('queued', 'processing')
+                                or (recent and job.status == 'uploaded')):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Removed by a cleanup since the scan
+        total -= size
+        logger.info(f"Evicted {path} to stay within the storage limit")
+
+
+async def sweep_storage_periodically():
+    """Run sweep_storage every STORAGE_SWEEP_SECONDS"""
+    while True:
+        await asyncio.sleep(STORAGE_SWEEP_SECONDS)
+        try:
+            sweep_storage()
+        except Exception as e:
+            logger.error(f"Error sweeping storage: {e}")
+
+
+async def render_worker():
+    """Take jobs off the queue and process them one at a time"""
+    while True:
+        job_id, video_path, filter_type, batch_size = await job_queue.get()
+        try:
+            await process_in_background(job_id, video_path, filter_type, batch_size)
+        finally:
+            job_queue.task_done()
 
 
 @app.get("/status/{job_id}")
@@ -335,26 +768,26 @@ async def get_status(job_id: str):
     Returns:
         Job status and results
     """
-    if job_id not in jobs:
-        logger.warning(f"Job {job_id} not found. Available jobs: {list(jobs.keys())}")
+    job = get_job(job_id)
+    if job is None:
+        logger.warning("Job %s not found", job_id)
         raise HTTPException(
             status_code=404, 
             detail=f"Job not found. Please upload a video first. Job ID: {job_id}"
         )
     
-    job = jobs[job_id]
-    logger.info(f"Status check for job {job_id}: {job['status']}")
+    logger.debug("Status check for job %s: %s", job_id, job.status)
     
     return JobStatus(
         job_id=job_id,
-        status=job['status'],
-        sequential_time=job.get('sequential_time'),
-        parallel_time=job.get('parallel_time'),
-        speedup=job.get('speedup'),
-        segments_processed=job.get('segments_processed'),
-        cpu_cores_used=job.get('cpu_cores_used'),
-        output_filename=job.get('output_filename'),
-        error=job.get('error')
+        status=job.status,
+        sequential_time=job.sequential_time,
+        parallel_time=job.parallel_time,
+        speedup=job.speedup,
+        segments_processed=job.segments_processed,
+        cpu_cores_used=job.cpu_cores_used,
+        output_filename=job.output_filename,
+        error=job.error
     )
 
 
@@ -363,31 +796,42 @@ async def download_video(job_id: str):
     """
     Download processed video
     
+    Supports HTTP Range requests (206 Partial Content), so players can seek
+    and interrupted downloads can resume
+    
     Args:
         job_id: Job identifier
         
     Returns:
         Processed video file
     """
-    if job_id not in jobs:
+    job = get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs[job_id]
-    
-    if job['status'] != 'completed':
+    if job.status != 'completed':
         raise HTTPException(
             status_code=400,
-            detail=f"Video not ready. Current status: {job['status']}"
+            detail=f"Video not ready. Current status: {job.status}"
         )
     
-    output_path = job.get('output_path')
+    output_path = job.output_path
     if not output_path or not os.path.exists(output_path):
         raise HTTPException(status_code=404, detail="Output file not found")
     
+    if ACCEL_REDIRECT_PREFIX:
+        return Response(
+            media_type="video/mp4",
+            headers={
+                'X-Accel-Redirect': ACCEL_REDIRECT_PREFIX + os.path.basename(output_path),
+                'Content-Disposition': f'attachment; filename="{job.output_filename}"'
+            }
+        )
+    
     return FileResponse(
         output_path,
         media_type="video/mp4",
-        filename=job['output_filename']
+        filename=job.output_filename
     )
 
 
@@ -402,36 +846,70 @@ async def cleanup_job(job_id: str):
     Returns:
         Confirmation message
     """
-    if job_id not in jobs:
+    job = get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs[job_id]
-    
     # Remove uploaded file
-    if 'file_path' in job and os.path.exists(job['file_path']):
-        os.remove(job['file_path'])
+    if job.file_path and os.path.exists(job.file_path):
+        os.remove(job.file_path)
         logger.info(f"Removed uploaded file for job {job_id}")
     
     # Remove output file
-    if 'output_path' in job and os.path.exists(job['output_path']):
-        os.remove(job['output_path'])
+    if job.output_path and os.path.exists(job.output_path):
+        os.remove(job.output_path)
         logger.info(f"Removed output file for job {job_id}")
     
     # Remove job from memory and disk
-    del jobs[job_id]
-    save_jobs()
+    delete_job(job_id)
     
     logger.info(f"Job {job_id} cleaned up successfully")
     
     return {"message": "Job cleaned up successfully"}
 
 
+@app.on_event("startup")
+async def startup_event():
+    """Prepare storage and start background tasks"""
+    global executor, flush_task
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    open_jobs_db()
+    migrate_legacy_jobs()
+    fail_interrupted_jobs()
+    
+    executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS, initializer=warm_up_worker)
+    # Workers are long-lived and reused across jobs; start them all now so
+    # the first jobs don't pay for process start-up, imports and warm-up
+    for _ in range(RENDER_WORKERS):
+        executor.submit(worker_ready)
+    flush_task = asyncio.create_task(flush_jobs())
+    background_tasks.extend(asyncio.create_task(render_worker()) for _ in range(RENDER_WORKERS))
+    if STORAGE_LIMIT_MB:
+        background_tasks.append(asyncio.create_task(sweep_storage_periodically()))
+    logger.info(f"Rendering up to {RENDER_WORKERS} videos concurrently")
+
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on shutdown"""
+    for task in background_tasks:
+        task.cancel()
     executor.shutdown(wait=True)
+    flush_task.cancel()
+    save_pending_jobs()
+    db.close()
+    read_db.close()
 
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        # uvloop and httptools come with uvicorn[standard]; uvloop has no Windows build
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
+    )
@@ -6,90 +6,151 @@ Uses OpenCV instead of MoviePy (no FFmpeg dependency)
 
 import os
 import time
+import functools
+import heapq
 import cv2
 import numpy as np
 import subprocess
 import shutil
-from multiprocessing import Pool, cpu_count
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from multiprocessing import cpu_count
+
+try:
+    import av
+except ImportError:
+    av = None
 
 
 # ============= FILTER FUNCTIONS =============
 
+# Rows per strip in tile_apply; a 1080p strip is ~370 KB, so it and its
+# intermediates stay in L2 between chained ops
+TILE_ROWS = 64
+
+
+def tile_apply(frame, ops, strip_rows=TILE_ROWS):
+    """
+    Run a chain of pointwise ops over a frame in horizontal strips
+    Each strip goes through every op before the next one is read, so the
+    intermediates stay in cache instead of making full-frame round-trips
+    
+    Args:
+        frame: Input frame
+        ops: Functions applied in turn to each strip
+        strip_rows: Rows per strip
+        
+    Returns:
+        Output frame
+    """
+    out = None
+    for y in range(0, frame.shape[0], strip_rows):
+        strip = frame[y:y + strip_rows]
+        for op in ops:
+            strip = op(strip)
+        if out is None:
+            out = np.empty((frame.shape[0],) + strip.shape[1:], dtype=strip.dtype)
+        out[y:y + strip_rows] = strip
+    return out
+
+
+def filter_constant(values, dtype):
+    """
+    Build a filter constant once at import time
+    Constants are contiguous and read-only, since every segment thread in a
+    worker shares the same arrays
+    """
+    constant = np.ascontiguousarray(values, dtype=dtype)
+    constant.setflags(write=False)
+    return constant
+
+
 def apply_grayscale(frame):
-    """Convert frame to grayscale"""
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    """Convert frame to grayscale (single channel)"""
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+# 15-tap Gaussian kernel, as GaussianBlur derives it for sigma=0
+BLUR_KERNEL = filter_constant(cv2.getGaussianKernel(15, 0).ravel(), np.float32)
 
 
 def apply_blur(frame):
     """Apply Gaussian blur"""
-    return cv2.GaussianBlur(frame, (15, 15), 0)
+    # On uint8, GaussianBlur takes OpenCV's bit-exact fixed-point path; the
+    # float separable filter is faster and matches it to within 1 level
+    return cv2.sepFilter2D(frame, -1, BLUR_KERNEL, BLUR_KERNEL)
+
+
+SEPIA_MATRIX = filter_constant([
+    [0.272, 0.534, 0.131],
+    [0.349, 0.686, 0.168],
+    [0.393, 0.769, 0.189]
+], np.float32)
 
 
 def apply_sepia(frame):
     """Apply sepia tone filter"""
-    sepia_matrix = np.array([
-        [0.272, 0.534, 0.131],
-        [0.349, 0.686, 0.168],
-        [0.393, 0.769, 0.189]
-    ])
-    sepia = cv2.transform(frame, sepia_matrix)
-    return np.clip(sepia, 0, 255).astype(np.uint8)
+    # cv2.transform saturates uint8 output itself, so no clip is needed
+    return cv2.transform(frame, SEPIA_MATRIX)
+
+
+def _scale_lut(factor, dtype):
+    """Build a 256-entry uint8 lookup table for a saturating multiply"""
+    return filter_constant(np.clip(np.arange(256, dtype=dtype) * factor, 0, 255), np.uint8)
+
+
+# Lookup tables map a frame in a single uint8 pass instead of via float
+# copies and clips
+BRIGHTNESS_LUT = _scale_lut(1.2, np.float64)
+
+# Per-channel gains in BGR order, applied with cv2.transform in one pass over
+# the interleaved frame; this beats splitting into planes and merging back
+WARM_TONE_MATRIX = filter_constant(np.diag([0.9, 1.05, 1.1]), np.float32)
+COOL_TONE_MATRIX = filter_constant(np.diag([1.15, 1.05, 0.9]), np.float32)
 
 
 def apply_brightness(frame):
     """Increase brightness by 20%"""
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    h, s, v = cv2.split(hsv)
-    # Increase value by 20%
-    v = np.clip(v * 1.2, 0, 255).astype(np.uint8)
-    hsv = cv2.merge([h, s, v])
-    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+    # Scaling every channel matches scaling HSV value, up to clipping
+    return cv2.LUT(frame, BRIGHTNESS_LUT)
 
 
 def apply_contrast(frame):
     """Increase contrast by 30%"""
-    # Apply contrast: new_pixel = alpha * pixel + beta
-    alpha = 1.3  # Contrast control (1.0-3.0)
-    beta = 0     # Brightness control (0-100)
-    return np.clip(alpha * frame + beta, 0, 255).astype(np.uint8)
+    # Apply contrast: new_pixel = alpha * pixel + beta, saturated to uint8
+    return cv2.convertScaleAbs(frame, alpha=1.3, beta=0)
+
+
+def _saturate_strip(strip):
+    """Push each pixel 25% further away from its gray level"""
+    gray = cv2.cvtColor(strip, cv2.COLOR_BGR2GRAY)
+    gray = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    return cv2.addWeighted(strip, 1.25, gray, -0.25, 0)
 
 
 def apply_saturation(frame):
     """Increase saturation by 25%"""
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    h, s, v = cv2.split(hsv)
-    # Increase saturation by 25%
-    s = np.clip(s * 1.25, 0, 255).astype(np.uint8)
-    hsv = cv2.merge([h, s, v])
-    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+    return tile_apply(frame, [_saturate_strip])
 
 
 def apply_warm_tone(frame):
     """Apply warm tone filter (increase red/yellow)"""
     # Increase red channel, decrease blue channel
-    result = frame.copy().astype(np.float32)
-    result[:, :, 2] = np.clip(result[:, :, 2] * 1.1, 0, 255)  # Red
-    result[:, :, 1] = np.clip(result[:, :, 1] * 1.05, 0, 255)  # Green
-    result[:, :, 0] = np.clip(result[:, :, 0] * 0.9, 0, 255)  # Blue
-    return result.astype(np.uint8)
+    return cv2.transform(frame, WARM_TONE_MATRIX)
 
 
 def apply_cool_tone(frame):
     """Apply cool tone filter (increase blue)"""
     # Increase blue channel, decrease red channel
-    result = frame.copy().astype(np.float32)
-    result[:, :, 0] = np.clip(result[:, :, 0] * 1.15, 0, 255)  # Blue
-    result[:, :, 1] = np.clip(result[:, :, 1] * 1.05, 0, 255)  # Green  
-    result[:, :, 2] = np.clip(result[:, :, 2] * 0.9, 0, 255)  # Red
-    return result.astype(np.uint8)
+    return cv2.transform(frame, COOL_TONE_MATRIX)
 
 
 def apply_edge_detection(frame):
-    """Apply edge detection (Canny)"""
+    """Apply edge detection (Canny, single channel)"""
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 100, 200)
-    return cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
+    return cv2.Canny(gray, 100, 200)
 
 
 # Filter mapping dictionary
@@ -106,14 +167,239 @@ FILTERS = {
 }
 
 
-def get_filter_function(filter_type):
-    """Get the filter function by name"""
-    return FILTERS.get(filter_type, lambda x: x)
+# Filters whose output pixel depends only on the same input pixel; these can
+# run once over a whole batch of frames stacked into one tall image
+POINTWISE_FILTERS = {
+    'grayscale', 'sepia', 'brightness', 'contrast',
+    'saturation', 'warm_tone', 'cool_tone'
+}
+
+
+def cuda_available():
+    """Check whether OpenCV was built with CUDA and can see a GPU"""
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        return False
+
+
+def make_cuda_filter(filter_type):
+    """
+    Build a GPU version of a filter with OpenCV's CUDA module
+    Only the neighbourhood filters are ported; pointwise ones are cheap
+    enough on the CPU that the upload and download would dominate
+    
+    Args:
+        filter_type: Type of filter
+        
+    Returns:
+        Filter function, or None if the filter has no CUDA version
+    """
+    if filter_type == 'blur':
+        # CUDA linear filters take 1 or 4 channels, so blur in BGRA
+        gaussian = cv2.cuda.createGaussianFilter(cv2.CV_8UC4, cv2.CV_8UC4, (15, 15), 0)
+        
+        def apply_blur_cuda(frame):
+            bgra = cv2.cuda.cvtColor(cv2.cuda_GpuMat(frame), cv2.COLOR_BGR2BGRA)
+            blurred = gaussian.apply(bgra)
+            return cv2.cuda.cvtColor(blurred, cv2.COLOR_BGRA2BGR).download()
+        return apply_blur_cuda
+    
+    if filter_type == 'edge_detection':
+        canny = cv2.cuda.createCannyEdgeDetector(100, 200)
+        
+        def apply_edge_detection_cuda(frame):
+            gray = cv2.cuda.cvtColor(cv2.cuda_GpuMat(frame), cv2.COLOR_BGR2GRAY)
+            return canny.detect(gray).download()
+        return apply_edge_detection_cuda
+    
+    return None
+
+
+# Filters that return single-channel frames; their videos are written in
+# grayscale rather than expanded back to BGR
+GRAYSCALE_FILTERS = {'grayscale', 'edge_detection'}
+
+
+def get_filter_function(filter_type, backend="cpu"):
+    """
+    Get the filter function by name
+    
+    Args:
+        filter_type: Type of filter
+        backend: "cuda" to prefer a GPU version of the filter, if there is one
+        
+    Raises:
+        ValueError: If the filter doesn't exist
+    """
+    if filter_type not in FILTERS:
+        raise ValueError(f"Unknown filter: {filter_type}. Available: {list(FILTERS.keys())}")
+    if backend == "cuda":
+        cuda_filter = make_cuda_filter(filter_type)
+        if cuda_filter is not None:
+            return cuda_filter
+    return FILTERS[filter_type]
+
+
+def make_batch_filter(filter_type, backend="cpu"):
+    """
+    Resolve a filter into a function over one decoded batch
+    Called once per segment, so the per-batch loop doesn't re-decide how to
+    apply the filter: pointwise filters run once over the whole batch, the
+    rest once per frame
+    
+    Args:
+        filter_type: Type of filter
+        backend: "cuda" to prefer a GPU version of the filter, if there is one
+        
+    Returns:
+        Function taking (frames, block) and returning the filtered frames,
+        where block is the frames' contiguous (N, H, W, 3) buffer or None
+    """
+    filter_func = get_filter_function(filter_type, backend)
+    
+    def filter_each(frames, block):
+        return [filter_func(frame) for frame in frames]
+    
+    if filter_type not in POINTWISE_FILTERS:
+        return filter_each
+    
+    def filter_block(frames, block):
+        if block is None:
+            return filter_each(frames, block)
+        n, height, width, channels = block.shape
+        processed = filter_func(block.reshape(n * height, width, channels))
+        return list(processed.reshape((n, height) + processed.shape[1:]))
+    
+    return filter_block
+
+
+def warm_up_filters():
+    """
+    Run every filter once on a small frame so OpenCV's one-time setup
+    (CPU dispatch, thread pool) happens before the first real video
+    """
+    frame = np.zeros((64, 64, 3), dtype=np.uint8)
+    for filter_func in FILTERS.values():
+        filter_func(frame)
+
+
+def has_audio_stream(video_path):
+    """
+    Check whether a video has an audio stream, with PyAV or else FFprobe
+    
+    Args:
+        video_path: Path to the video file
+        
+    Returns:
+        True if the video has audio
+    """
+    if av is not None:
+        with av.open(video_path) as container:
+            return len(container.streams.audio) > 0
+    
+    probe_cmd = [
+        'ffprobe', '-v', 'error', '-select_streams', 'a',
+        '-show_entries', 'stream=codec_type', '-of', 'csv=p=0',
+        video_path
+    ]
+    result = subprocess.run(probe_cmd, capture_output=True, text=True)
+    return 'audio' in result.stdout
+
+
+def copy_stream_packets(source, in_stream, output, out_stream):
+    """
+    Copy every packet of one stream into an output container, without re-encoding
+    
+    Args:
+        source: PyAV input container
+        in_stream: Stream of source to copy
+        output: PyAV output container
+        out_stream: Stream of output to copy into
+    """
+    for packet in source.demux(in_stream):
+        # Skip the empty packet demux yields at the end of the stream
+        if packet.dts is None:
+            continue
+        packet.stream = out_stream
+        output.mux(packet)
+
+
+def timed_packets(source, in_stream, out_stream):
+    """
+    Yield (seconds, packet) for one stream, retargeted at an output stream
+    
+    Args:
+        source: PyAV input container
+        in_stream: Stream of source to read
+        out_stream: Output stream the packets will be muxed into
+    """
+    for packet in source.demux(in_stream):
+        if packet.dts is None:
+            continue
+        seconds = float(packet.dts * in_stream.time_base)
+        packet.stream = out_stream
+        yield seconds, packet
+
+
+def extract_audio_pyav(video_path, audio_path):
+    """
+    Copy the audio stream of a video into its own file with PyAV, in-process
+    
+    Args:
+        video_path: Path to the video file
+        audio_path: Path to save the extracted audio
+        
+    Returns:
+        True if audio was extracted, False if video has no audio
+    """
+    with av.open(video_path) as source:
+        if not source.streams.audio:
+            print("Video has no audio stream")
+            return False
+        
+        in_stream = source.streams.audio[0]
+        with av.open(audio_path, mode='w') as output:
+            out_stream = add_stream_like(output, in_stream)
+            copy_stream_packets(source, in_stream, output, out_stream)
+    
+    print(f"Audio extracted to: {audio_path}")
+    return True
+
+
+def merge_audio_pyav(video_path, audio_path, output_path):
+    """
+    Mux a video and an audio track into one file with PyAV, without re-encoding
+    Packets are interleaved by time, and audio past the end of the video is
+    dropped (like FFmpeg's -shortest)
+    
+    Args:
+        video_path: Path to the video file (without audio)
+        audio_path: Path to the audio file
+        output_path: Path for the output video with audio
+    """
+    with av.open(video_path) as video_source, av.open(audio_path) as audio_source, \
+            av.open(output_path, mode='w', format='mp4') as output:
+        video_in = video_source.streams.video[0]
+        audio_in = audio_source.streams.audio[0]
+        video_out = add_stream_like(output, video_in)
+        audio_out = add_stream_like(output, audio_in)
+        video_end = float(video_in.duration * video_in.time_base) if video_in.duration else None
+        
+        packets = heapq.merge(
+            timed_packets(video_source, video_in, video_out),
+            timed_packets(audio_source, audio_in, audio_out),
+            key=lambda timed: timed[0]
+        )
+        for seconds, packet in packets:
+            if packet.stream is audio_out and video_end is not None and seconds >= video_end:
+                continue
+            output.mux(packet)
 
 
 def extract_audio(video_path, audio_path):
     """
-    Extract audio from video using FFmpeg
+    Extract audio from video, in-process with PyAV or else using FFmpeg
     
     Args:
         video_path: Path to the video file
@@ -122,16 +408,15 @@ def extract_audio(video_path, audio_path):
     Returns:
         True if audio was extracted, False if video has no audio
     """
+    if av is not None:
+        try:
+            return extract_audio_pyav(video_path, audio_path)
+        except Exception as e:
+            print(f"Failed to extract audio with PyAV, trying FFmpeg: {e}")
+    
     try:
         # Check if video has audio stream
-        probe_cmd = [
-            'ffprobe', '-v', 'error', '-select_streams', 'a',
-            '-show_entries', 'stream=codec_type', '-of', 'csv=p=0',
-            video_path
-        ]
-        result = subprocess.run(probe_cmd, capture_output=True, text=True)
-        
-        if 'audio' not in result.stdout:
+        if not has_audio_stream(video_path):
             print("Video has no audio stream")
             return False
         
@@ -154,7 +439,7 @@ def extract_audio(video_path, audio_path):
 
 def merge_audio_with_video(video_path, audio_path, output_path):
     """
-    Merge audio track with video using FFmpeg
+    Merge audio track with video, in-process with PyAV or else using FFmpeg
     
     Args:
         video_path: Path to the video file (without audio)
@@ -164,10 +449,22 @@ def merge_audio_with_video(video_path, audio_path, output_path):
     Returns:
         True if successful, False otherwise
     """
+    # Create temp output path
+    temp_output = output_path + ".temp.mp4"
+    
+    if av is not None:
+        try:
+            merge_audio_pyav(video_path, audio_path, temp_output)
+            os.replace(temp_output, output_path)
+            print(f"Audio merged successfully: {output_path}")
+            return True
+        except Exception as e:
+            # e.g. an audio codec MP4 can't carry; FFmpeg re-encodes it to AAC
+            print(f"Failed to merge audio with PyAV, trying FFmpeg: {e}")
+            if os.path.exists(temp_output):
+                os.remove(temp_output)
+    
     try:
-        # Create temp output path
-        temp_output = output_path + ".temp.mp4"
-        
         cmd = [
             'ffmpeg', '-y',
             '-i', video_path,
@@ -197,22 +494,366 @@ def merge_audio_with_video(video_path, audio_path, output_path):
         return False
     except FileNotFoundError:
         print("FFmpeg not found. Audio will not be merged.")
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+        return False
+
+
+def concat_segments(segment_paths, output_path, list_path):
+    """
+    Join video segments with FFmpeg's concat demuxer, without re-encoding
+    
+    Args:
+        segment_paths: List of segment paths, in order
+        output_path: Path for the joined video
+        list_path: Path to write the concat list file to
+        
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        with open(list_path, 'w') as f:
+            for segment_path in segment_paths:
+                f.write(f"file '{os.path.abspath(segment_path)}'\n")
+        
+        cmd = [
+            'ffmpeg', '-y', '-f', 'concat', '-safe', '0',
+            '-i', list_path, '-c', 'copy', output_path
+        ]
+        subprocess.run(cmd, capture_output=True, check=True)
+        return True
+        
+    except subprocess.CalledProcessError as e:
+        print(f"Failed to concat segments: {e}")
+        return False
+    except FileNotFoundError:
+        print("FFmpeg not found. Segments will be re-encoded.")
         return False
 
 
+def add_stream_like(output, in_stream):
+    """
+    Add an output stream copying another stream's codec parameters
+    PyAV 14 renamed add_stream(template=...) to add_stream_from_template()
+    
+    Args:
+        output: PyAV output container
+        in_stream: Stream to copy parameters from
+        
+    Returns:
+        The new output stream
+    """
+    if hasattr(output, 'add_stream_from_template'):
+        return output.add_stream_from_template(in_stream)
+    return output.add_stream(template=in_stream)
+
+
+def remux_segments(segment_paths, output_path):
+    """
+    Join video segments packet by packet with PyAV, without re-encoding
+    
+    Args:
+        segment_paths: List of segment paths, in order
+        output_path: Path for the joined video
+        
+    Returns:
+        True if successful, False otherwise (including when PyAV is missing)
+    """
+    if av is None:
+        return False
+    
+    try:
+        with av.open(output_path, mode='w') as output:
+            out_stream = None
+            offset = 0
+            for segment_path in segment_paths:
+                with av.open(segment_path) as segment:
+                    in_stream = segment.streams.video[0]
+                    if out_stream is None:
+                        out_stream = add_stream_like(output, in_stream)
+                    
+                    # Shift each segment's timestamps to start where the last one ended
+                    end = offset
+                    for packet in segment.demux(in_stream):
+                        if packet.dts is None:
+                            continue
+                        packet.pts += offset
+                        packet.dts += offset
+                        packet.stream = out_stream
+                        end = max(end, packet.pts + packet.duration)
+                        output.mux(packet)
+                    offset = end
+        return True
+        
+    except Exception as e:
+        # Any PyAV problem just means falling back to FFmpeg or re-encoding
+        print(f"Failed to remux segments: {e}")
+        return False
+
+
+# FFmpeg filtergraphs matching the OpenCV filters, for the hardware path.
+# Channel mixes are the OpenCV BGR matrices rewritten in RGB order
+FFMPEG_FILTERS = {
+    'grayscale': 'hue=s=0',
+    'blur': 'gblur=sigma=2.6',
+    'sepia': 'colorchannelmixer=rr=0.189:rg=0.769:rb=0.393:gr=0.168:gg=0.686:gb=0.349:br=0.131:bg=0.534:bb=0.272',
+    'brightness': 'colorchannelmixer=rr=1.2:gg=1.2:bb=1.2',
+    'contrast': 'colorchannelmixer=rr=1.3:gg=1.3:bb=1.3',
+    'saturation': 'eq=saturation=1.25',
+    'warm_tone': 'colorchannelmixer=rr=1.1:gg=1.05:bb=0.9',
+    'cool_tone': 'colorchannelmixer=rr=0.9:gg=1.05:bb=1.15',
+    'edge_detection': 'edgedetect=low=0.39:high=0.78'
+}
+
+# Hardware H.264 encoders, in order of preference
+HW_ENCODERS = ('h264_nvenc', 'h264_qsv', 'h264_videotoolbox')
+
+
+@functools.lru_cache(maxsize=None)
+def get_hw_encoder():
+    """
+    Find a hardware H.264 encoder that FFmpeg can use on this machine
+    Each candidate is tried on a short test clip, since FFmpeg builds often
+    list encoders for devices that aren't present. The result is cached
+    
+    Returns:
+        Encoder name, or None if there is none or FFmpeg is not installed
+    """
+    for encoder in HW_ENCODERS:
+        cmd = [
+            'ffmpeg', '-hide_banner', '-f', 'lavfi',
+            '-i', 'color=size=256x256:duration=0.1',
+            '-c:v', encoder, '-f', 'null', '-'
+        ]
+        try:
+            subprocess.run(cmd, capture_output=True, check=True, timeout=30)
+            print(f"Using hardware encoder: {encoder}")
+            return encoder
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            continue
+        except FileNotFoundError:
+            return None
+    return None
+
+
+# Default number of frames decoded and filtered together
+DEFAULT_BATCH_SIZE = 8
+
+# Upper bound on the bytes in one decoded batch. Each segment thread keeps
+# PIPELINE_BUFFERS batches (plus their filtered copies) alive, so large
+# frames get smaller batches instead of multiplying memory use
+BATCH_BYTES = 16 * 1024 * 1024
+
+
+# Reused batch buffers shared by the decode, filter and encode stages;
+# one per stage is enough to keep all three busy
+PIPELINE_BUFFERS = 3
+
+
+def filter_frames(cap, out, batch_filter, batch_size=DEFAULT_BATCH_SIZE, frame_count=None):
+    """
+    Read, filter and write every frame of a video, batch_size frames at a time
+    Decoding and encoding run on their own threads (OpenCV releases the GIL
+    for both) so they overlap with filtering. Frames are decoded into a small
+    pool of reused (batch_size, H, W, 3) buffers that the writer hands back
+    once a batch is encoded
+    
+    Args:
+        cap: Opened cv2.VideoCapture to read from
+        out: Opened cv2.VideoWriter to write to
+        batch_filter: Batch filter from make_batch_filter()
+        batch_size: Number of frames per batch, capped so a batch fits BATCH_BYTES
+        frame_count: Number of frames to process (default: until the end)
+    """
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if width > 0 and height > 0:
+        batch_size = min(batch_size, max(1, BATCH_BYTES // (width * height * 3)))
+    
+    decoded = queue.Queue(maxsize=PIPELINE_BUFFERS)
+    filtered = queue.Queue(maxsize=PIPELINE_BUFFERS)
+    free_batches = queue.Queue()
+    stop = threading.Event()
+    errors = []
+    
+    def read_batches():
+        batch = None
+        buffers = 0
+        remaining = frame_count
+        try:
+            while not stop.is_set():
+                frames = []
+                wanted = batch_size if remaining is None else min(batch_size, remaining)
+                for i in range(wanted):
+                    ret, frame = cap.read(None if batch is None else batch[i])
+                    if not ret:
+                        break
+                    frames.append(frame)
+                if frames:
+                    # The decoder only reuses the buffer when the frame shape fits
+                    in_place = batch is not None and all(
+                        frame.ctypes.data == batch[i].ctypes.data
+                        for i, frame in enumerate(frames)
+                    )
+                    decoded.put((batch, frames, batch[:len(frames)] if in_place else None))
+                if remaining is not None:
+                    remaining -= len(frames)
+                if len(frames) < batch_size or remaining == 0:
+                    break
+                
+                # Fill the buffer pool once, then only reuse encoded batches
+                if buffers < PIPELINE_BUFFERS:
+                    batch = np.empty((batch_size,) + frames[0].shape, dtype=frames[0].dtype)
+                    buffers += 1
+                else:
+                    batch = free_batches.get()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            decoded.put(None)
+    
+    def write_batches():
+        failed = False
+        while True:
+            item = filtered.get()
+            if item is None:
+                break
+            batch, processed = item
+            if not failed:
+                try:
+                    for frame in processed:
+                        out.write(frame)
+                except Exception as e:
+                    errors.append(e)
+                    failed = True
+            if batch is not None:
+                free_batches.put(batch)
+    
+    reader = threading.Thread(target=read_batches, daemon=True)
+    writer = threading.Thread(target=write_batches, daemon=True)
+    reader.start()
+    writer.start()
+    
+    item = None
+    try:
+        while not errors:
+            item = decoded.get()
+            if item is None:
+                break
+            
+            # Apply filter
+            batch, frames, block = item
+            filtered.put((batch, batch_filter(frames, block)))
+    finally:
+        # Stop the reader and drain it, returning its buffers so it can't block
+        stop.set()
+        while item is not None:
+            item = decoded.get()
+            if item is not None and item[0] is not None:
+                free_batches.put(item[0])
+        filtered.put(None)
+        reader.join()
+        writer.join()
+    
+    if errors:
+        raise errors[0]
+
+
+def open_segment(video_path, start_frame):
+    """
+    Open a video positioned at the first frame of a segment
+    
+    Args:
+        video_path: Path to the video file
+        start_frame: Index of the first frame to read
+        
+    Returns:
+        Opened cv2.VideoCapture
+    """
+    cap = cv2.VideoCapture(video_path)
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    return cap
+
+
+# libx264 preset for PyAV encodes; much faster than the default "medium"
+H264_PRESET = 'veryfast'
+
+# PyAV wheels bundle libx264, but builds against a system FFmpeg may not
+AV_H264_AVAILABLE = av is not None and 'libx264' in av.codecs_available
+
+
+class AVWriter:
+    """
+    H.264 writer backed by PyAV's libx264, with the cv2.VideoWriter interface
+    Used where OpenCV's own build can't encode avc1 (e.g. pip wheels)
+    """
+    
+    def __init__(self, output_path, fps, width, height, is_color=True):
+        self.frame_format = 'bgr24' if is_color else 'gray'
+        self.container = av.open(output_path, mode='w')
+        self.stream = self.container.add_stream('libx264', rate=Fraction(fps).limit_denominator(1001))
+        self.stream.width = width
+        self.stream.height = height
+        self.stream.pix_fmt = 'yuv420p'
+        self.stream.options = {'preset': H264_PRESET}
+    
+    def isOpened(self):
+        return True
+    
+    def write(self, frame):
+        video_frame = av.VideoFrame.from_ndarray(frame, format=self.frame_format)
+        self.container.mux(self.stream.encode(video_frame))
+    
+    def release(self):
+        # Flush buffered frames out of the encoder
+        self.container.mux(self.stream.encode())
+        self.container.close()
+
+
+def open_video_writer(output_path, fps, width, height, is_color=True):
+    """
+    Open a browser-compatible (H.264) video writer
+    Prefers PyAV's libx264 (when available), then OpenCV's avc1, then mp4v
+    
+    Args:
+        output_path: Path of the video to write
+        fps: Frame rate
+        width: Frame width
+        height: Frame height
+        is_color: False if frames are single-channel grayscale
+        
+    Returns:
+        Writer with write() and release()
+    """
+    # yuv420p needs even dimensions
+    if AV_H264_AVAILABLE and width % 2 == 0 and height % 2 == 0:
+        return AVWriter(output_path, fps, width, height, is_color)
+    
+    # Try avc1 first, fallback to mp4v if not available
+    fourcc = cv2.VideoWriter_fourcc(*'avc1')
+    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height), is_color)
+    if not out.isOpened():
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height), is_color)
+    return out
+
+
 def apply_filter_to_segment(args):
     """
     Worker function for parallel processing
     
     Args:
-        args: Tuple of (segment_path, filter_type, output_path, segment_index)
+        args: Tuple of (video_path, start_frame, end_frame, filter_type, output_path,
+              segment_index, batch_size, backend)
     """
-    segment_path, filter_type, output_path, segment_index = args
+    (video_path, start_frame, end_frame, filter_type, output_path,
+     segment_index, batch_size, backend) = args
     print(f"  [Worker] Processing segment {segment_index}...")
     
     try:
-        # Open video
-        cap = cv2.VideoCapture(segment_path)
+        # Open video at the start of the segment
+        cap = open_segment(video_path, start_frame)
         
         # Get video properties
         fps = cap.get(cv2.CAP_PROP_FPS)
@@ -220,25 +861,15 @@ def apply_filter_to_segment(args):
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
         # Create video writer with browser-compatible codec (H.264)
-        # Try avc1 first, fallback to mp4v if not available
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-        if not out.isOpened():
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        out = open_video_writer(output_path, fps, width, height,
+                                is_color=filter_type not in GRAYSCALE_FILTERS)
         
-        # Get filter function
-        filter_func = get_filter_function(filter_type)
+        # Resolve how each batch is filtered, once per segment
+        batch_filter = make_batch_filter(filter_type, backend)
         
-        # Process each frame
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Apply filter
-            processed = filter_func(frame)
-            out.write(processed)
+        # Process frames in batches
+        frame_count = None if end_frame is None else end_frame - start_frame
+        filter_frames(cap, out, batch_filter, batch_size, frame_count)
         
         # Release resources
         cap.release()
@@ -258,22 +889,29 @@ class VideoProcessor:
     Uses OpenCV for video processing
     """
     
-    def __init__(self, video_path, segment_duration=10):
+    def __init__(self, video_path, segment_duration=10, work_dir="segments", output_dir="outputs",
+                 backend="cpu", cores=None):
         """
         Initialize the video processor
         
         Args:
             video_path: Path to input video file
             segment_duration: Duration of each segment in seconds (default: 10)
+            work_dir: Directory for temporary segment files, removed after processing
+            output_dir: Directory for the final output video
+            backend: "cpu", or "cuda" to run filters on the GPU where possible
+            cores: CPU cores this render may use (default: all of them)
         """
         self.video_path = video_path
         self.segment_duration = segment_duration
-        self.segments_dir = "segments"
-        self.output_dir = "outputs"
+        self.segments_dir = work_dir
+        self.output_dir = output_dir
+        self.cores = cores or cpu_count()
         
-        # Create necessary directories
-        os.makedirs(self.segments_dir, exist_ok=True)
-        os.makedirs(self.output_dir, exist_ok=True)
+        if backend == "cuda" and not cuda_available():
+            print("CUDA not available, falling back to CPU filters")
+            backend = "cpu"
+        self.backend = backend
     
     def get_video_analytics(self):
         """
@@ -336,12 +974,15 @@ class VideoProcessor:
                 'bitrate_mbps': 0
             }
     
-    def split_video(self):
+    def plan_segments(self):
         """
-        Split video into segments
+        Divide the video into segments of frames
+        Segments are frame ranges of the original video that each worker seeks
+        to, so no segment files are written
         
         Returns:
-            List of segment file paths
+            List of (start_frame, end_frame) tuples; the last end_frame is None
+            so the final segment runs to the end of the video
         """
         print(f"Loading video: {self.video_path}")
         
@@ -352,66 +993,37 @@ class VideoProcessor:
         
         # Get video properties
         fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         duration = total_frames / fps
+        cap.release()
         
         frames_per_segment = int(fps * self.segment_duration)
-        segment_count = int(np.ceil(total_frames / frames_per_segment))
+        segment_count = max(1, int(np.ceil(total_frames / frames_per_segment)))
         
         print(f"Video: {duration:.1f}s, {total_frames} frames, {fps:.1f} fps")
         print(f"Splitting into {segment_count} segments...")
         
-        segment_paths = []
-        # Use browser-compatible codec (H.264)
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')
-        
-        current_segment = 0
-        frame_count = 0
-        out = None
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Check if we need to start a new segment
-            if frame_count % frames_per_segment == 0:
-                # Close previous segment
-                if out is not None:
-                    out.release()
-                
-                # Start new segment
-                segment_path = os.path.join(self.segments_dir, f"segment_{current_segment:03d}.mp4")
-                out = cv2.VideoWriter(segment_path, fourcc, fps, (width, height))
-                segment_paths.append(segment_path)
-                
-                print(f"  Creating segment {current_segment + 1}/{segment_count}")
-                current_segment += 1
-            
-            out.write(frame)
-            frame_count += 1
-        
-        # Close last segment
-        if out is not None:
-            out.release()
-        
-        cap.release()
-        
-        print(f"Created {len(segment_paths)} segments")
-        return segment_paths
+        segments = [
+            (i * frames_per_segment, (i + 1) * frames_per_segment)
+            for i in range(segment_count)
+        ]
+        segments[-1] = (segments[-1][0], None)
+        return segments
     
-    def apply_filter(self, video_path, filter_type, output_path):
+    def apply_filter(self, video_path, filter_type, output_path, batch_size=DEFAULT_BATCH_SIZE,
+                     start_frame=0, end_frame=None):
         """
         Apply a filter to a video segment
         
         Args:
-            video_path: Path to input video segment
+            video_path: Path to input video
             filter_type: Type of filter
             output_path: Path to save processed video
+            batch_size: Number of frames filtered per batch
+            start_frame: First frame of the segment
+            end_frame: Frame after the last one in the segment (default: end of video)
         """
-        cap = cv2.VideoCapture(video_path)
+        cap = open_segment(video_path, start_frame)
         
         if not cap.isOpened():
             raise Exception(f"Could not open video: {video_path}")
@@ -422,35 +1034,27 @@ class VideoProcessor:
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
         # Create video writer with browser-compatible codec
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-        if not out.isOpened():
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        out = open_video_writer(output_path, fps, width, height,
+                                is_color=filter_type not in GRAYSCALE_FILTERS)
         
-        # Get filter function
-        filter_func = get_filter_function(filter_type)
+        # Resolve how each batch is filtered, once per segment
+        batch_filter = make_batch_filter(filter_type, self.backend)
         
-        # Process each frame
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Apply filter
-            processed = filter_func(frame)
-            out.write(processed)
+        # Process frames in batches
+        frame_count = None if end_frame is None else end_frame - start_frame
+        filter_frames(cap, out, batch_filter, batch_size, frame_count)
         
         cap.release()
         out.release()
     
-    def process_sequential(self, segment_paths, filter_type):
+    def process_sequential(self, segments, filter_type, batch_size=DEFAULT_BATCH_SIZE):
         """
         Process video segments sequentially (one at a time)
         
         Args:
-            segment_paths: List of segment file paths
+            segments: List of (start_frame, end_frame) segments
             filter_type: Type of filter to apply
+            batch_size: Number of frames filtered per batch
             
         Returns:
             Tuple of (processed_paths, execution_time)
@@ -459,10 +1063,11 @@ class VideoProcessor:
         start_time = time.time()
         
         processed_paths = []
-        for i, segment_path in enumerate(segment_paths):
-            output_path = os.path.join(self.output_dir, f"seq_processed_{i:03d}.mp4")
-            print(f"Processing segment {i+1}/{len(segment_paths)}...")
-            self.apply_filter(segment_path, filter_type, output_path)
+        for i, (start_frame, end_frame) in enumerate(segments):
+            output_path = os.path.join(self.segments_dir, f"seq_processed_{i:03d}.mp4")
+            print(f"Processing segment {i+1}/{len(segments)}...")
+            self.apply_filter(self.video_path, filter_type, output_path, batch_size,
+                              start_frame, end_frame)
             processed_paths.append(output_path)
         
         end_time = time.time()
@@ -471,33 +1076,40 @@ class VideoProcessor:
         print(f"Sequential processing completed in {execution_time:.2f} seconds")
         return processed_paths, execution_time
     
-    def process_parallel(self, segment_paths, filter_type):
+    def process_parallel(self, segments, filter_type, batch_size=DEFAULT_BATCH_SIZE):
         """
-        Process video segments in parallel using multiprocessing
+        Process video segments in parallel on a thread pool
+        OpenCV releases the GIL while decoding, filtering and encoding, so
+        threads run in parallel without pickling frames or spawning processes
         
         Args:
-            segment_paths: List of segment file paths
+            segments: List of (start_frame, end_frame) segments
             filter_type: Type of filter to apply
+            batch_size: Number of frames filtered per batch
             
         Returns:
             Tuple of (processed_paths, execution_time)
         """
         print("\n=== Parallel Processing ===")
-        num_cores = cpu_count()
+        num_cores = self.cores
         print(f"Using {num_cores} CPU cores")
         
         start_time = time.time()
         
         # Prepare arguments for parallel processing
         args_list = [
-            (segment_path, filter_type, 
-             os.path.join(self.output_dir, f"par_processed_{i:03d}.mp4"), i+1)
-            for i, segment_path in enumerate(segment_paths)
+            (self.video_path, start_frame, end_frame, filter_type,
+             os.path.join(self.segments_dir, f"par_processed_{i:03d}.mp4"), i+1, batch_size,
+             self.backend)
+            for i, (start_frame, end_frame) in enumerate(segments)
         ]
         
-        # Use multiprocessing Pool to process segments in parallel
-        with Pool(processes=num_cores) as pool:
-            processed_paths = pool.map(apply_filter_to_segment, args_list)
+        # Split the cores between segment threads and OpenCV's own threads
+        workers = min(num_cores, len(args_list))
+        cv2.setNumThreads(max(1, num_cores // workers))
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            processed_paths = list(pool.map(apply_filter_to_segment, args_list))
         
         end_time = time.time()
         execution_time = end_time - start_time
@@ -518,6 +1130,13 @@ class VideoProcessor:
         if not segment_paths:
             raise Exception("No segments to merge")
         
+        # Segments share one encoding, so they can be joined without re-encoding
+        list_path = os.path.join(self.segments_dir, "segments.txt")
+        if (remux_segments(segment_paths, output_path)
+                or concat_segments(segment_paths, output_path, list_path)):
+            print(f"Merged video saved to: {output_path}")
+            return
+        
         # Get properties from first segment
         cap = cv2.VideoCapture(segment_paths[0])
         fps = cap.get(cv2.CAP_PROP_FPS)
@@ -526,11 +1145,7 @@ class VideoProcessor:
         cap.release()
         
         # Create output video with browser-compatible codec
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-        if not out.isOpened():
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        out = open_video_writer(output_path, fps, width, height)
         
         # Write all segments to output
         for segment_path in segment_paths:
@@ -551,20 +1166,58 @@ class VideoProcessor:
         """
         Remove temporary segment files
         """
-        import shutil
-        
         if os.path.exists(self.segments_dir):
-            shutil.rmtree(self.segments_dir)
-            os.makedirs(self.segments_dir, exist_ok=True)
-        
-        if os.path.exists(self.output_dir):
-            for file in os.listdir(self.output_dir):
-                if file.startswith("seq_") or file.startswith("par_"):
-                    os.remove(os.path.join(self.output_dir, file))
+            shutil.rmtree(self.segments_dir, ignore_errors=True)
         
         print("Temporary files cleaned up")
     
-    def process_video(self, filter_type, output_filename):
+    def process_with_ffmpeg(self, filter_type, output_path, encoder):
+        """
+        Render the whole video with a single FFmpeg filtergraph
+        Decoding and encoding run on the hardware video engine, leaving the
+        CPU to the filter alone; audio is carried over in the same pass
+        
+        Args:
+            filter_type: Type of filter (must be in FFMPEG_FILTERS)
+            output_path: Path for the final output video
+            encoder: Hardware encoder name from get_hw_encoder()
+            
+        Returns:
+            Dictionary with processing results, or None if FFmpeg failed
+        """
+        print(f"\n=== Hardware Processing ({encoder}) ===")
+        start_time = time.time()
+        
+        cmd = [
+            'ffmpeg', '-y', '-hwaccel', 'auto',
+            '-i', self.video_path,
+            '-vf', FFMPEG_FILTERS[filter_type],
+            '-map', '0:v:0', '-map', '0:a?',
+            '-c:v', encoder,
+            '-c:a', 'aac',
+            output_path
+        ]
+        try:
+            subprocess.run(cmd, capture_output=True, check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Hardware processing failed, falling back to OpenCV: {e}")
+            return None
+        
+        execution_time = time.time() - start_time
+        print(f"Hardware processing completed in {execution_time:.2f} seconds")
+        
+        return {
+            'success': True,
+            'output_path': output_path,
+            'sequential_time': round(execution_time, 2),
+            'parallel_time': round(execution_time, 2),
+            'speedup': 1.0,
+            'segments_processed': 1,
+            'cpu_cores_used': cpu_count(),
+            'audio_preserved': has_audio_stream(self.video_path)
+        }
+    
+    def process_video(self, filter_type, output_filename, batch_size=DEFAULT_BATCH_SIZE):
         """
         Complete video processing workflow - OPTIMIZED (parallel only)
         Now preserves original audio!
@@ -572,38 +1225,59 @@ class VideoProcessor:
         Args:
             filter_type: Type of filter to apply
             output_filename: Name for the final output video
+            batch_size: Number of frames filtered per batch
             
         Returns:
             Dictionary with processing results
         """
+        # Render under a temporary name and move it into place at the end, so
+        # the output is always a new file even if other jobs hard-link the old one
+        output_path = os.path.join(self.output_dir, output_filename)
+        part_path = output_path + ".part.mp4"
+        
         try:
             # Validate filter type
             if filter_type not in FILTERS:
                 raise ValueError(f"Unknown filter: {filter_type}. Available: {list(FILTERS.keys())}")
             
+            # Create necessary directories
+            os.makedirs(self.segments_dir, exist_ok=True)
+            os.makedirs(self.output_dir, exist_ok=True)
+            
+            # Use the hardware video engine when the filter has an FFmpeg equivalent
+            encoder = get_hw_encoder()
+            if encoder and filter_type in FFMPEG_FILTERS:
+                result = self.process_with_ffmpeg(filter_type, part_path, encoder)
+                if result is not None:
+                    os.replace(part_path, output_path)
+                    result['output_path'] = output_path
+                    self.cleanup_segments()
+                    return result
+            
             # Step 0: Extract audio from original video (if it has audio)
-            audio_path = os.path.join(self.segments_dir, "original_audio.aac")
+            # Matroska can hold any audio codec, so the stream is copied as is
+            audio_path = os.path.join(self.segments_dir, "original_audio.mka")
             has_audio = extract_audio(self.video_path, audio_path)
             
-            # Step 1: Split video into segments
-            segment_paths = self.split_video()
+            # Step 1: Plan segments as frame ranges of the original video
+            segments = self.plan_segments()
             
             # Step 2: Process in parallel ONLY (skip sequential to save time!)
-            par_paths, par_time = self.process_parallel(segment_paths, filter_type)
+            par_paths, par_time = self.process_parallel(segments, filter_type, batch_size)
             
             # Step 3: Merge parallel processed segments
-            output_path = os.path.join(self.output_dir, output_filename)
-            self.merge_segments(par_paths, output_path)
+            self.merge_segments(par_paths, part_path)
             
             # Step 4: Merge audio back with the processed video
             if has_audio and os.path.exists(audio_path):
                 print("Merging original audio with processed video...")
-                merge_audio_with_video(output_path, audio_path, output_path)
+                merge_audio_with_video(part_path, audio_path, part_path)
+            os.replace(part_path, output_path)
             
             # Step 5: Estimate sequential time based on parallel performance
             # Sequential would take roughly: parallel_time * num_cores (simplified estimate)
-            num_cores = cpu_count()
-            estimated_seq_time = par_time * min(num_cores, len(segment_paths))
+            num_cores = self.cores
+            estimated_seq_time = par_time * min(num_cores, len(segments))
             
             # Step 6: Calculate speedup
             speedup = estimated_seq_time / par_time if par_time > 0 else 1.0
@@ -617,7 +1291,7 @@ class VideoProcessor:
                 'sequential_time': round(estimated_seq_time, 2),  # Estimated
                 'parallel_time': round(par_time, 2),
                 'speedup': round(speedup, 2),
-                'segments_processed': len(segment_paths),
+                'segments_processed': len(segments),
                 'cpu_cores_used': num_cores,
                 'audio_preserved': has_audio
             }
@@ -626,6 +1300,9 @@ class VideoProcessor:
             print(f"Error during video processing: {str(e)}")
             import traceback
             traceback.print_exc()
+            self.cleanup_segments()
+            if os.path.exists(part_path):
+                os.remove(part_path)
             return {
                 'success': False,
                 'error': str(e)